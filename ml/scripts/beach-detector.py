@@ -14,12 +14,13 @@ Usage:
 import sys
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
-    from ultralytics import YOLO
     import cv2
     import numpy as np
+    from tiling import IMAGE_EXTENSIONS, detect_people, export_model, exported_model, read_image
 except ImportError:
     print(json.dumps({
         "success": False,
@@ -28,74 +29,14 @@ except ImportError:
     sys.exit(1)
 
 
-def slice_image(image, slice_size=640, overlap=0.2):
-    """
-    Slice image into overlapping tiles for better small object detection.
-    This is a simplified version of SAHI (Slicing Aided Hyper Inference).
-    """
-    h, w = image.shape[:2]
-    stride = int(slice_size * (1 - overlap))
-    slices = []
-
-    for y in range(0, h, stride):
-        for x in range(0, w, stride):
-            x_end = min(x + slice_size, w)
-            y_end = min(y + slice_size, h)
-            x_start = max(0, x_end - slice_size)
-            y_start = max(0, y_end - slice_size)
-
-            slice_img = image[y_start:y_end, x_start:x_end]
-            slices.append({
-                'image': slice_img,
-                'offset': (x_start, y_start)
-            })
+# Annotated images are encoded and written here so detection doesn't wait on
+# disk; pending writes still finish before the interpreter exits
+WRITE_POOL = ThreadPoolExecutor(max_workers=1)
+ANNOTATED_JPEG_QUALITY = 85
 
-    return slices
 
-
-def merge_detections(all_detections, iou_threshold=0.5):
-    """
-    Merge detections from multiple slices, removing duplicates via NMS.
-    """
-    if not all_detections:
-        return []
-
-    boxes = np.array([[d['bbox'][0], d['bbox'][1], d['bbox'][2], d['bbox'][3]] for d in all_detections])
-    scores = np.array([d['confidence'] for d in all_detections])
-
-    # Simple NMS implementation
-    indices = []
-    order = scores.argsort()[::-1]
-
-    while len(order) > 0:
-        i = order[0]
-        indices.append(i)
-
-        if len(order) == 1:
-            break
-
-        # Calculate IoU with remaining boxes
-        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
-        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
-        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
-        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
-
-        w = np.maximum(0, xx2 - xx1)
-        h = np.maximum(0, yy2 - yy1)
-
-        inter = w * h
-        area_i = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
-        area_rest = (boxes[order[1:], 2] - boxes[order[1:], 0]) * (boxes[order[1:], 3] - boxes[order[1:], 1])
-
-        iou = inter / (area_i + area_rest - inter + 1e-6)
-
-        remaining = np.where(iou <= iou_threshold)[0]
-        order = order[remaining + 1]
-
-    return [all_detections[i] for i in indices]
-
-
-def detect_beach_crowd(image_path, model_path='yolov8m.pt', confidence=0.15, use_slicing=True, visualize=False):
+def detect_beach_crowd(image_path, model_path='yolov8m.pt', confidence=0.15, use_slicing=True, visualize=False,
+                       use_export=True):
     """
     Detect people on beach using optimized settings.
 
@@ -105,107 +46,65 @@ def detect_beach_crowd(image_path, model_path='yolov8m.pt', confidence=0.15, use
         confidence: Confidence threshold (lower for distant people)
         use_slicing: Whether to use image slicing for small objects
         visualize: Whether to save annotated image
+        use_export: Run the NCNN/OpenVINO/TensorRT export of a .pt model if
+            one was made with --export
 
     Returns:
         dict with detection results
     """
-    # Load model
-    model = YOLO(model_path)
+    # Prefer an existing export for this machine; the model itself is
+    # loaded once per process by detect_people
+    if use_export:
+        model_path = exported_model(model_path)
 
-    # Load image
-    image = cv2.imread(str(image_path))
+    # Load image (decoded at reduced size when larger than 4K)
+    image, decode_scale, image_size = read_image(image_path)
     if image is None:
         return {"success": False, "error": f"Could not load image: {image_path}"}
+    orig_w, orig_h = image_size
 
-    h, w = image.shape[:2]
-    all_detections = []
-
-    if use_slicing and (w > 1280 or h > 1280):
-        # Use slicing for large images
-        slices = slice_image(image, slice_size=640, overlap=0.25)
-
-        for slice_data in slices:
-            results = model(
-                slice_data['image'],
-                conf=confidence,
-                classes=[0],  # Person class only
-                verbose=False
-            )
-
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    # Adjust coordinates back to original image
-                    ox, oy = slice_data['offset']
-                    all_detections.append({
-                        'bbox': [x1 + ox, y1 + oy, x2 + ox, y2 + oy],
-                        'confidence': float(box.conf[0]),
-                        'class': 'person'
-                    })
-
-        # Merge overlapping detections
-        all_detections = merge_detections(all_detections, iou_threshold=0.4)
+    # Full-image pass plus adaptive slicing, merged with one NMS
+    kept_boxes, kept_scores = detect_people(model_path, image, confidence, use_slicing)
+    kept_boxes = kept_boxes * decode_scale
 
-    else:
-        # Direct detection for smaller images
-        results = model(
-            image,
-            conf=confidence,
-            classes=[0],
-            verbose=False
-        )
-
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                all_detections.append({
-                    'bbox': [x1, y1, x2, y2],
-                    'confidence': float(box.conf[0]),
-                    'class': 'person'
-                })
-
-    # Also run full-image detection to catch larger people
-    full_results = model(image, conf=confidence, classes=[0], verbose=False)
-    for r in full_results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            all_detections.append({
-                'bbox': [x1, y1, x2, y2],
-                'confidence': float(box.conf[0]),
-                'class': 'person'
-            })
-
-    # Final NMS to remove duplicates
-    all_detections = merge_detections(all_detections, iou_threshold=0.4)
+    all_detections = [
+        {'bbox': box.tolist(), 'confidence': float(score), 'class': 'person'}
+        for box, score in zip(kept_boxes, kept_scores)
+    ]
 
     # Sort by confidence
     all_detections.sort(key=lambda x: x['confidence'], reverse=True)
 
     # Calculate statistics
     total = len(all_detections)
-    confidences = [d['confidence'] for d in all_detections]
+    if kept_scores.size:
+        min_conf = round(float(kept_scores.min()), 3)
+        max_conf = round(float(kept_scores.max()), 3)
+        avg_conf = round(float(kept_scores.mean(dtype=np.float64)), 3)
+    else:
+        min_conf = max_conf = avg_conf = 0
 
     result = {
         "success": True,
         "image_path": str(image_path),
-        "image_size": {"width": w, "height": h},
+        "image_size": {"width": orig_w, "height": orig_h},
         "model": model_path,
         "confidence_threshold": confidence,
         "slicing_enabled": use_slicing,
         "detections": {
             "total_persons": total,
-            "min_confidence": round(min(confidences), 3) if confidences else 0,
-            "max_confidence": round(max(confidences), 3) if confidences else 0,
-            "avg_confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0,
+            "min_confidence": min_conf,
+            "max_confidence": max_conf,
+            "avg_confidence": avg_conf,
             "persons": all_detections
         }
     }
 
     # Visualize if requested
     if visualize and total > 0:
-        annotated = image.copy()
+        # Draw straight onto the decoded frame; detection is done with it
         for det in all_detections:
-            x1, y1, x2, y2 = [int(v) for v in det['bbox']]
+            x1, y1, x2, y2 = [int(v / decode_scale) for v in det['bbox']]
             conf = det['confidence']
 
             # Color based on confidence
@@ -216,19 +115,20 @@ def detect_beach_crowd(image_path, model_path='yolov8m.pt', confidence=0.15, use
             else:
                 color = (0, 165, 255)  # Orange - low
 
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(annotated, f'{conf:.2f}', (x1, y1-5),
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(image, f'{conf:.2f}', (x1, y1-5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
 
         # Add count overlay
-        cv2.putText(annotated, f'People detected: {total}', (10, 30),
+        cv2.putText(image, f'People detected: {total}', (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
         # Save annotated image
         output_dir = Path(image_path).parent / 'annotated'
         output_dir.mkdir(exist_ok=True)
         output_path = output_dir / f'{Path(image_path).stem}_beach_annotated.jpg'
-        cv2.imwrite(str(output_path), annotated)
+        WRITE_POOL.submit(cv2.imwrite, str(output_path), image,
+                          [cv2.IMWRITE_JPEG_QUALITY, ANNOTATED_JPEG_QUALITY])
         result['annotated_image_path'] = str(output_path)
 
     return result
@@ -236,30 +136,50 @@ def detect_beach_crowd(image_path, model_path='yolov8m.pt', confidence=0.15, use
 
 def main():
     parser = argparse.ArgumentParser(description='Beach-optimized person detection')
-    parser.add_argument('image', help='Path to beach image')
+    parser.add_argument('image', help='Path to beach image, or a directory of images')
     parser.add_argument('--model', default='yolov8m.pt', help='YOLO model path')
     parser.add_argument('--confidence', type=float, default=0.15, help='Confidence threshold')
     parser.add_argument('--no-slicing', action='store_true', help='Disable image slicing')
     parser.add_argument('--visualize', action='store_true', help='Save annotated image')
+    export = parser.add_mutually_exclusive_group()
+    export.add_argument('--export', action='store_true',
+                        help='Export the .pt model for this machine first (once; later runs reuse it)')
+    export.add_argument('--no-export', action='store_true', help='Run the .pt model even if an export exists')
     parser.add_argument('--json', action='store_true', help='Output as JSON')
 
     args = parser.parse_args()
 
-    result = detect_beach_crowd(
-        args.image,
-        model_path=args.model,
-        confidence=args.confidence,
-        use_slicing=not args.no_slicing,
-        visualize=args.visualize
-    )
+    input_path = Path(args.image)
+    if input_path.is_dir():
+        image_paths = sorted(p for p in input_path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    else:
+        image_paths = [input_path]
+
+    # Exporting is a one-off setup step, never a side effect of detection
+    model_path = export_model(args.model) if args.export else args.model
+
+    # The model is loaded on the first image and reused for the rest
+    results = [
+        detect_beach_crowd(
+            str(image_path),
+            model_path=model_path,
+            confidence=args.confidence,
+            use_slicing=not args.no_slicing,
+            visualize=args.visualize,
+            use_export=not args.no_export
+        )
+        for image_path in image_paths
+    ]
 
     if args.json:
-        print(json.dumps(result, indent=2))
-    else:
+        print(json.dumps(results if input_path.is_dir() else results[0], indent=2))
+        return
+
+    for result in results:
         if result['success']:
             print(f"\n🏖️  Beach Crowd Detection Results")
             print(f"{'─' * 40}")
-            print(f"Image: {Path(args.image).name}")
+            print(f"Image: {Path(result['image_path']).name}")
             print(f"People detected: {result['detections']['total_persons']}")
             if result['detections']['total_persons'] > 0:
                 print(f"Confidence range: {result['detections']['min_confidence']:.2f} - {result['detections']['max_confidence']:.2f}")
@@ -0,0 +1,110 @@
+"""
+Numba kernels for pixel-density-analyzer.py
+
+Fused per-pixel passes that build the skin, bright-color and gray images,
+the Sobel edge mask and the mask counts. Imported only for multi-image
+batches, where the numba import and JIT warm-up are paid once; single images
+use the OpenCV path in the analyzer instead.
+"""
+
+import numpy as np
+from numba import njit, prange, set_num_threads
+
+
+@njit(inline='always')
+def _is_bright(b, g, r, min_saturation, min_value):
+    """
+    Bright, saturated color test on one BGR pixel.
+
+    Equivalent to cv2.inRange on OpenCV's 8-bit HSV with V >= min_value and
+    S >= min_saturation (any hue): V is max(B, G, R), and
+    S = 255 * (V - min) / V rounds to at least S_min exactly when
+    510 * (V - min) >= (2 * S_min - 1) * V.
+    """
+    v = max(b, g, r)
+    return v >= min_value and 510 * (v - min(b, g, r)) >= (2 * min_saturation - 1) * v
+
+
+@njit(inline='always')
+def _is_skin(b, g, r, cg_range, cg_cr_sum_range):
+    """
+    YCgCr skin test (de Dios & Garcia) on one BGR pixel.
+
+    Skin falls in a single rectangle rotated in the Cg/Cr plane, bounded by
+    cg_range on Cg and cg_cr_sum_range on Cg + Cr.
+    """
+    cg = 128.0 + (-81.085 * r + 112.0 * g - 30.915 * b) / 255.0
+    if cg < cg_range[0] or cg > cg_range[1]:
+        return False
+    cr = 128.0 + (112.0 * r - 93.786 * g - 18.214 * b) / 255.0
+    return cg_cr_sum_range[0] <= cg + cr <= cg_cr_sum_range[1]
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def compute_masks(img, skin, bright, gray, cg_range, cg_cr_sum_range, min_saturation, min_value):
+    """
+    Fill the skin and bright-color masks and the grayscale image in one pass.
+
+    Everything is derived from the BGR pixel, so the image is read once and no
+    HSV or gray conversion is needed. Gray uses the fixed-point BT.601 weights
+    (77, 150, 29) / 256. Rows are split across threads.
+    """
+    for i in prange(img.shape[0]):
+        for j in range(img.shape[1]):
+            b = np.int32(img[i, j, 0])
+            g = np.int32(img[i, j, 1])
+            r = np.int32(img[i, j, 2])
+            is_skin = _is_skin(np.float32(b), np.float32(g), np.float32(r), cg_range, cg_cr_sum_range)
+            skin[i, j] = 255 if is_skin else 0
+            bright[i, j] = 255 if _is_bright(b, g, r, min_saturation, min_value) else 0
+            gray[i, j] = (77 * r + 150 * g + 29 * b + 128) >> 8
+
+
+@njit(parallel=True, cache=True)
+def count_masks(skin, bright, edges):
+    """
+    Count non-zero pixels of the cleaned masks in one pass.
+
+    Returns (skin, bright, edge, activity) counts, where activity is the union
+    of skin and bright. Replaces four countNonZero scans and the combined mask.
+    """
+    skin_count = 0
+    bright_count = 0
+    edge_count = 0
+    activity_count = 0
+    for i in prange(skin.shape[0]):
+        for j in range(skin.shape[1]):
+            is_skin = skin[i, j] != 0
+            is_bright = bright[i, j] != 0
+            skin_count += is_skin
+            bright_count += is_bright
+            edge_count += edges[i, j] != 0
+            activity_count += is_skin or is_bright
+    return skin_count, bright_count, edge_count, activity_count
+
+
+@njit(parallel=True, cache=True)
+def sobel_edges(gray, threshold, edges):
+    """
+    Mark pixels whose 3x3 Sobel gradient magnitude |gx| + |gy| exceeds threshold.
+
+    Border pixels are left unmarked. Rows are split across threads.
+    """
+    height, width = gray.shape
+    edges[0, :] = 0
+    edges[height - 1, :] = 0
+    for i in prange(1, height - 1):
+        edges[i, 0] = 0
+        edges[i, width - 1] = 0
+        for j in range(1, width - 1):
+            tl = np.int32(gray[i - 1, j - 1])
+            tc = np.int32(gray[i - 1, j])
+            tr = np.int32(gray[i - 1, j + 1])
+            ml = np.int32(gray[i, j - 1])
+            mr = np.int32(gray[i, j + 1])
+            bl = np.int32(gray[i + 1, j - 1])
+            bc = np.int32(gray[i + 1, j])
+            br = np.int32(gray[i + 1, j + 1])
+            gx = (tr + 2 * mr + br) - (tl + 2 * ml + bl)
+            gy = (bl + 2 * bc + br) - (tl + 2 * tc + tr)
+            edges[i, j] = 255 if abs(gx) + abs(gy) > threshold else 0
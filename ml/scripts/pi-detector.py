@@ -8,7 +8,7 @@ Uses YOLOv8s with image slicing for best accuracy/speed balance.
 Performance (estimated):
 - Pi 5 (8GB): ~3-5 seconds per frame
 - Pi 4 (4GB): ~5-10 seconds per frame
-- With NCNN export: ~2x faster
+- With NCNN export: ~2x faster (run once with --export)
 
 Usage:
     python pi-detector.py <image_path> [options]
@@ -16,8 +16,7 @@ Usage:
 
 Setup on Raspberry Pi:
     pip install ultralytics opencv-python-headless numpy
-    # Optional: Export to NCNN for faster inference
-    python -c "from ultralytics import YOLO; YOLO('yolov8s.pt').export(format='ncnn')"
+    python pi-detector.py <image_path> --export  # one-off NCNN export, reused after
 
 Author: BeachWatch Team
 """
@@ -25,15 +24,13 @@ Author: BeachWatch Team
 import sys
 import json
 import argparse
-import subprocess
-import tempfile
 from pathlib import Path
 from datetime import datetime
 
 try:
-    from ultralytics import YOLO
     import cv2
     import numpy as np
+    from tiling import IMAGE_EXTENSIONS, detect_people, export_model, exported_model, read_image
 except ImportError as e:
     print(json.dumps({
         "success": False,
@@ -45,183 +42,86 @@ except ImportError as e:
 # Default model - yolov8s is best for Pi (good accuracy, reasonable speed)
 DEFAULT_MODEL = 'yolov8s.pt'
 DEFAULT_CONFIDENCE = 0.15
-SLICE_SIZE = 640
-SLICE_OVERLAP = 0.25
 
 
-def capture_hls_frame(stream_url, output_path=None, timeout=30):
+def capture_hls_frame(stream_url, timeout=30):
     """
-    Capture a single frame from an HLS stream using ffmpeg.
+    Grab a single frame from an HLS stream with OpenCV's FFmpeg backend.
+
+    The frame is decoded straight into memory, skipping the ffmpeg
+    subprocess and the JPEG round-trip through disk.
 
     Args:
         stream_url: HLS stream URL (m3u8)
-        output_path: Where to save the frame (default: temp file)
-        timeout: Timeout in seconds
+        timeout: Open/read timeout in seconds
 
     Returns:
-        Path to captured frame or None on failure
+        BGR frame as a numpy array or None on failure
     """
-    if output_path is None:
-        output_path = tempfile.mktemp(suffix='.jpg')
-
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', stream_url,
-        '-frames:v', '1',
-        '-update', '1',
-        '-q:v', '2',
-        output_path
-    ]
-
+    timeout_ms = int(timeout * 1000)
+    cap = cv2.VideoCapture(stream_url, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+    ])
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            timeout=timeout
-        )
-        if result.returncode == 0 and Path(output_path).exists():
-            return output_path
-        return None
-    except subprocess.TimeoutExpired:
-        return None
-    except FileNotFoundError:
-        print("Error: ffmpeg not found. Install with: sudo apt install ffmpeg")
-        return None
-
-
-def slice_image(image, slice_size=SLICE_SIZE, overlap=SLICE_OVERLAP):
-    """Split image into overlapping tiles for small object detection."""
-    h, w = image.shape[:2]
-    stride = int(slice_size * (1 - overlap))
-    slices = []
-
-    for y in range(0, h, stride):
-        for x in range(0, w, stride):
-            x_end = min(x + slice_size, w)
-            y_end = min(y + slice_size, h)
-            x_start = max(0, x_end - slice_size)
-            y_start = max(0, y_end - slice_size)
-
-            slice_img = image[y_start:y_end, x_start:x_end]
-            slices.append({
-                'image': slice_img,
-                'offset': (x_start, y_start)
-            })
-
-    return slices
-
-
-def nms_merge(detections, iou_threshold=0.4):
-    """Merge overlapping detections using Non-Maximum Suppression."""
-    if not detections:
-        return []
-
-    boxes = np.array([[d['bbox'][0], d['bbox'][1], d['bbox'][2], d['bbox'][3]] for d in detections])
-    scores = np.array([d['confidence'] for d in detections])
-
-    indices = []
-    order = scores.argsort()[::-1]
-
-    while len(order) > 0:
-        i = order[0]
-        indices.append(i)
-
-        if len(order) == 1:
-            break
-
-        # Calculate IoU
-        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
-        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
-        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
-        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
-
-        w = np.maximum(0, xx2 - xx1)
-        h = np.maximum(0, yy2 - yy1)
+        if not cap.isOpened():
+            print("Error: could not open stream (is OpenCV built with FFmpeg?)", file=sys.stderr)
+            return None
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        ok, frame = cap.read()
+        return frame if ok else None
+    finally:
+        cap.release()
 
-        inter = w * h
-        area_i = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
-        area_rest = (boxes[order[1:], 2] - boxes[order[1:], 0]) * (boxes[order[1:], 3] - boxes[order[1:], 1])
 
-        iou = inter / (area_i + area_rest - inter + 1e-6)
-        remaining = np.where(iou <= iou_threshold)[0]
-        order = order[remaining + 1]
-
-    return [detections[i] for i in indices]
-
-
-def detect(image_path, model_path=DEFAULT_MODEL, confidence=DEFAULT_CONFIDENCE, use_slicing=True):
+def detect(image_path, model_path=DEFAULT_MODEL, confidence=DEFAULT_CONFIDENCE, use_slicing=True, use_export=True):
     """
     Detect people in beach image.
 
     Args:
-        image_path: Path to image file
+        image_path: Path to image file, or an already decoded BGR frame
         model_path: YOLO model path (supports .pt, _ncnn_model/, _openvino_model/)
         confidence: Confidence threshold
         use_slicing: Enable image slicing for small objects
+        use_export: Run the export of a .pt model if one was made with --export
 
     Returns:
         dict with detection results
     """
-    # Load model
-    model = YOLO(model_path)
-
-    # Load image
-    image = cv2.imread(str(image_path))
-    if image is None:
-        return {"success": False, "error": f"Could not load image: {image_path}"}
-
-    h, w = image.shape[:2]
-    all_detections = []
-
-    # Sliced detection for large images
-    if use_slicing and (w > 1280 or h > 1280):
-        slices = slice_image(image)
-
-        for slice_data in slices:
-            results = model(
-                slice_data['image'],
-                conf=confidence,
-                classes=[0],  # Person only
-                verbose=False
-            )
-
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    ox, oy = slice_data['offset']
-                    all_detections.append({
-                        'bbox': [x1 + ox, y1 + oy, x2 + ox, y2 + oy],
-                        'confidence': float(box.conf[0])
-                    })
-
-        all_detections = nms_merge(all_detections)
-
-    # Full image detection
-    full_results = model(image, conf=confidence, classes=[0], verbose=False)
-    for r in full_results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            all_detections.append({
-                'bbox': [x1, y1, x2, y2],
-                'confidence': float(box.conf[0])
-            })
-
-    # Final merge
-    all_detections = nms_merge(all_detections)
+    # Prefer an existing export for this machine; the model itself is
+    # loaded once per process by detect_people
+    if use_export:
+        model_path = exported_model(model_path)
+
+    # Load image (captured frames arrive already decoded)
+    if isinstance(image_path, np.ndarray):
+        image, image_path = image_path, None
+    else:
+        image, _, _ = read_image(image_path)
+        if image is None:
+            return {"success": False, "error": f"Could not load image: {image_path}"}
+
+    # Full-image pass plus adaptive slicing, merged with one NMS
+    _, kept_scores = detect_people(model_path, image, confidence, use_slicing)
 
     # Calculate stats
-    total = len(all_detections)
-    confidences = [d['confidence'] for d in all_detections]
+    total = len(kept_scores)
+    if kept_scores.size:
+        min_conf = round(float(kept_scores.min()), 3)
+        max_conf = round(float(kept_scores.max()), 3)
+        avg_conf = round(float(kept_scores.mean(dtype=np.float64)), 3)
+    else:
+        min_conf = max_conf = avg_conf = 0
 
     return {
         "success": True,
         "timestamp": datetime.now().isoformat(),
-        "image_path": str(image_path),
+        "image_path": str(image_path) if image_path is not None else None,
         "model": model_path,
         "person_count": total,
-        "min_confidence": round(min(confidences), 3) if confidences else 0,
-        "max_confidence": round(max(confidences), 3) if confidences else 0,
-        "avg_confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0
+        "min_confidence": min_conf,
+        "max_confidence": max_conf,
+        "avg_confidence": avg_conf
     }
 
 
@@ -269,6 +169,9 @@ Examples:
   # Detect from image
   python pi-detector.py beach.jpg
 
+  # Detect every image in a directory (model loaded once)
+  python pi-detector.py frames/ --json
+
   # Capture from HLS stream and detect
   python pi-detector.py --capture --stream "https://s116.ipcamlive.com/streams/xxx/stream.m3u8"
 
@@ -281,14 +184,18 @@ Examples:
     )
 
     # Main arguments
-    parser.add_argument('image', nargs='?', help='Image path to analyze')
+    parser.add_argument('image', nargs='?', help='Image path (or directory of images) to analyze')
     parser.add_argument('--capture', action='store_true', help='Capture from HLS stream first')
     parser.add_argument('--stream', help='HLS stream URL (requires --capture)')
-    parser.add_argument('--output', help='Output image path for capture')
+    parser.add_argument('--output', help='Also save the captured frame to this path')
     parser.add_argument('--model', default=DEFAULT_MODEL, help='YOLO model path')
     parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE)
     parser.add_argument('--beach-area', type=float, default=5000, help='Beach area in sqm')
     parser.add_argument('--no-slicing', action='store_true', help='Disable image slicing')
+    export = parser.add_mutually_exclusive_group()
+    export.add_argument('--export', action='store_true',
+                        help='Export the .pt model to NCNN/OpenVINO/TensorRT first (once; later runs reuse it)')
+    export.add_argument('--no-export', action='store_true', help='Use the .pt model even if an export exists')
     parser.add_argument('--json', action='store_true', help='JSON output')
 
     args = parser.parse_args()
@@ -302,37 +209,58 @@ Examples:
             sys.exit(1)
 
         print(f"Capturing from stream...", file=sys.stderr)
-        image_path = capture_hls_frame(args.stream, args.output)
-        if not image_path:
+        frame = capture_hls_frame(args.stream)
+        if frame is None:
             result = {"success": False, "error": "Failed to capture frame from stream"}
             print(json.dumps(result) if args.json else f"Error: {result['error']}")
             sys.exit(1)
-        print(f"Captured: {image_path}", file=sys.stderr)
+        if args.output:
+            cv2.imwrite(args.output, frame)
+        print(f"Captured: {frame.shape[1]}x{frame.shape[0]}", file=sys.stderr)
 
     # Need an image to analyze
-    if not image_path:
+    if not args.capture and not image_path:
         parser.print_help()
         sys.exit(1)
 
-    # Run detection
+    is_dir = not args.capture and Path(image_path).is_dir()
+    if args.capture:
+        image_paths = [frame]
+    elif is_dir:
+        image_paths = sorted(p for p in Path(image_path).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    else:
+        image_paths = [image_path]
+
+    # Exporting is a one-off setup step, never a side effect of detection
+    model_path = export_model(args.model) if args.export else args.model
+
+    # Run detection; the model is loaded once and reused for every image
     print(f"Analyzing...", file=sys.stderr)
-    result = detect(
-        image_path,
-        args.model,
-        args.confidence,
-        use_slicing=not args.no_slicing
-    )
+    results = []
+    for path in image_paths:
+        result = detect(
+            path if args.capture else str(path),
+            model_path,
+            args.confidence,
+            use_slicing=not args.no_slicing,
+            use_export=not args.no_export
+        )
 
-    if result['success']:
-        busyness = calculate_busyness(result['person_count'], args.beach_area)
-        result.update(busyness)
+        if result['success']:
+            busyness = calculate_busyness(result['person_count'], args.beach_area)
+            result.update(busyness)
+        results.append(result)
 
     if args.json:
-        print(json.dumps(result, indent=2))
-    else:
+        print(json.dumps(results if is_dir else results[0], indent=2))
+        return
+
+    for result in results:
         if result['success']:
             print(f"\n🏖️  Beach Analysis")
             print(f"{'─' * 30}")
+            if is_dir:
+                print(f"Image: {Path(result['image_path']).name}")
             print(f"People: {result['person_count']}")
             print(f"Score: {result['score']}/100 ({result['level']})")
             print(f"Density: {result['density']} per 100sqm")
@@ -9,9 +9,11 @@ skin tones, and activity areas in beach images.
 
 Usage:
     python pixel-density-analyzer.py <image_path> [--json]
+    python pixel-density-analyzer.py --batch paths.txt|<directory> [--json]
 
 Requirements:
     pip install opencv-python numpy pillow
+    pip install numba  # optional: faster --batch runs (see density_kernels.py)
 
 Author: BeachWatch Team
 Date: 2026-01-23
@@ -21,6 +23,9 @@ import os
 import sys
 import json
 import argparse
+from bisect import bisect_right
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 import numpy as np
 
 try:
@@ -33,8 +38,192 @@ except ImportError:
     }))
     sys.exit(1)
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
 
-def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_debug: bool = False):
+# Debug images are encoded and written off the analysis thread, downscaled
+# since they are only for eyeballing
+DEBUG_WRITE_POOL = ThreadPoolExecutor(max_workers=2)
+DEBUG_IMAGE_SCALE = 0.5
+_pending_debug_writes = []
+
+# Skin rectangle in YCgCr (de Dios & Garcia): bounds on Cg and on Cg + Cr
+SKIN_CG_RANGE = (85.0, 135.0)
+SKIN_CG_CR_SUM_RANGE = (260.0, 280.0)
+
+# Bright, saturated beach-gear colors: minimum OpenCV HSV saturation and value
+BRIGHT_MIN_SATURATION = 50
+BRIGHT_MIN_VALUE = 100
+
+# Structuring element for cleaning the skin mask. A rectangle lets OpenCV
+# run morphology as separable row and column passes.
+SKIN_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+
+# Confidence tiers: signal strength below 1%, 3% and 6% of the image maps to
+# 0.3, 0.5 and 0.7 respectively; anything stronger is 0.85
+CONFIDENCE_THRESHOLDS = (1.0, 3.0, 6.0)
+CONFIDENCE_LEVELS = (0.3, 0.5, 0.7, 0.85)
+
+# Sobel |gx| + |gy| above which a pixel counts as an edge. Chosen so edge
+# coverage tracks the old Canny(50, 150) + 2x dilation output on webcam frames.
+EDGE_GRADIENT_THRESHOLD = 30
+
+# BGR -> (Cg, Cg + Cr) for cv2.transform, last column the offset
+SKIN_TRANSFORM = np.array([
+    [-30.915, 112.0, -81.085, 128.0 * 255],
+    [-49.129, 18.214, 30.915, 256.0 * 255],
+], dtype=np.float32) / 255
+
+# BGR -> gray with the fixed-point BT.601 weights (77, 150, 29) / 256 used by
+# density_kernels; the 1/512 offset rounds halves up like its + 128 >> 8
+GRAY_TRANSFORM = np.array([[29, 150, 77, 0.5]], dtype=np.float32) / 256
+
+
+def _write_debug_image(path, image):
+    """Downscale and write one debug image (runs on DEBUG_WRITE_POOL)."""
+    small = cv2.resize(image, None, fx=DEBUG_IMAGE_SCALE, fy=DEBUG_IMAGE_SCALE, interpolation=cv2.INTER_AREA)
+    cv2.imwrite(path, small)
+
+
+def save_debug_image(path, image):
+    """Queue a debug image for writing without waiting for the encode."""
+    _pending_debug_writes[:] = [future for future in _pending_debug_writes if not future.done()]
+    _pending_debug_writes.append(DEBUG_WRITE_POOL.submit(_write_debug_image, str(path), image))
+
+
+def wait_for_debug_writes():
+    """Block until every queued debug image has been written."""
+    wait(_pending_debug_writes)
+    _pending_debug_writes.clear()
+
+
+@lru_cache(maxsize=1)
+def _numba_kernels():
+    """
+    The numba kernels module, or None when numba isn't installed.
+
+    Imported on first use only: the numba import and JIT warm-up cost more
+    than they save on a single image.
+    """
+    try:
+        import density_kernels
+    except ImportError:
+        return None
+    return density_kernels
+
+
+def _compute_masks_cv2(img, skin, bright, gray):
+    """
+    OpenCV equivalent of density_kernels.compute_masks.
+
+    Skin is an inRange on (Cg, Cg + Cr), bright an inRange on HSV.
+    """
+    ycgcr = cv2.transform(img.astype(np.float32), SKIN_TRANSFORM)
+    cv2.inRange(ycgcr, (SKIN_CG_RANGE[0], SKIN_CG_CR_SUM_RANGE[0]),
+                (SKIN_CG_RANGE[1], SKIN_CG_CR_SUM_RANGE[1]), dst=skin)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    cv2.inRange(hsv, (0, BRIGHT_MIN_SATURATION, BRIGHT_MIN_VALUE), (255, 255, 255), dst=bright)
+    cv2.transform(img, GRAY_TRANSFORM, dst=gray[..., None])
+
+
+def _sobel_edges_cv2(gray, threshold, edges):
+    """
+    OpenCV equivalent of density_kernels.sobel_edges.
+
+    |gx| and |gy| saturate at 255 before adding, which can't flip a
+    comparison against a threshold below 255.
+    """
+    gx = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 1, 0))
+    gy = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 0, 1))
+    cv2.threshold(cv2.add(gx, gy), threshold, 255, cv2.THRESH_BINARY, dst=edges)
+    edges[[0, -1], :] = 0
+    edges[:, [0, -1]] = 0
+
+
+def _count_masks(skin, bright, edges, kernels=None):
+    """Return (skin, bright, edge, activity) pixel counts; activity is skin or bright."""
+    if kernels is not None:
+        return kernels.count_masks(skin, bright, edges)
+    return (cv2.countNonZero(skin), cv2.countNonZero(bright), cv2.countNonZero(edges),
+            cv2.countNonZero(cv2.bitwise_or(skin, bright)))
+
+
+@lru_cache(maxsize=2)
+def _mask_buffers(height, width):
+    """
+    Reusable (skin, bright, gray, edges) buffers for one image size.
+
+    Webcam frames keep the same size, so batch runs reuse these instead of
+    allocating four full-size arrays per image.
+    """
+    return tuple(np.empty((height, width), dtype=np.uint8) for _ in range(4))
+
+
+def _build_masks(img, buffers=None, kernels=None):
+    """
+    Build the cleaned skin, bright-color and edge masks for an image.
+
+    Everything is written into the given (skin, bright, gray, edges) buffers,
+    or fresh ones if none are given; morphology runs in place. The per-pixel
+    passes use the numba kernels if given, else OpenCV.
+    """
+    # =====================================================================
+    # 1. SKIN TONE DETECTION
+    # =====================================================================
+    # Detect human skin tones (exposed skin on beach)
+    # A single YCgCr rectangle computed from BGR (see SKIN_TRANSFORM); unlike
+    # HSV hue ranges it does not wrap around and rejects more sand
+
+    # Skin, bright-color (section 2) and gray (section 3) images all come
+    # from a single fused pass over the image with the numba kernels
+    if buffers is None:
+        height, width = img.shape[:2]
+        buffers = tuple(np.empty((height, width), dtype=np.uint8) for _ in range(4))
+    skin_mask, bright_mask, gray, edges = buffers
+    if kernels is not None:
+        kernels.compute_masks(img, skin_mask, bright_mask, gray, SKIN_CG_RANGE, SKIN_CG_CR_SUM_RANGE,
+                              BRIGHT_MIN_SATURATION, BRIGHT_MIN_VALUE)
+    else:
+        _compute_masks_cv2(img, skin_mask, bright_mask, gray)
+
+    # Apply morphological operations to reduce noise. A single open and
+    # close with a 7x7 element cleans up about as much as two iterations
+    # each with 5x5, at a quarter of the passes.
+    cv2.morphologyEx(skin_mask, cv2.MORPH_OPEN, SKIN_KERNEL, dst=skin_mask)
+    cv2.morphologyEx(skin_mask, cv2.MORPH_CLOSE, SKIN_KERNEL, dst=skin_mask)
+
+    # =====================================================================
+    # 2. BRIGHT COLOR DETECTION (swimwear, towels, umbrellas)
+    # =====================================================================
+    # Bright, saturated colors typical of beach gear: HSV S >= 50, V >= 100.
+    # The raw mask is used as-is: it only feeds a weighted percentage, where
+    # speckle removal made no practical difference.
+
+    # =====================================================================
+    # 3. ACTIVITY AREA DETECTION (texture variation)
+    # =====================================================================
+    # Mark areas with high variation by thresholding the Sobel gradient
+    # magnitude; see _sobel_edges_cv2
+    if kernels is not None:
+        kernels.sobel_edges(gray, EDGE_GRADIENT_THRESHOLD, edges)
+    else:
+        _sobel_edges_cv2(gray, EDGE_GRADIENT_THRESHOLD, edges)
+
+    return skin_mask, bright_mask, edges
+
+
+def _compute_counts_fast(img, kernels=None):
+    """Return (skin, bright, edge, activity) pixel counts, reusing the shared buffers."""
+    return _count_masks(*_build_masks(img, _mask_buffers(*img.shape[:2]), kernels), kernels)
+
+
+def _compute_with_debug(img, kernels=None):
+    """Return the pixel counts together with freshly allocated masks for debug images."""
+    masks = _build_masks(img, kernels=kernels)
+    return _count_masks(*masks, kernels), masks
+
+
+def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_debug: bool = False,
+                          use_numba: bool = False):
     """
     Analyze pixel density to estimate crowd levels as a fallback to YOLO detection.
 
@@ -47,6 +236,7 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
         image_path: Path to the beach image
         beach_area_sqm: Beach area in square meters (for density calculation)
         save_debug: Whether to save debug visualization images
+        use_numba: Use the numba kernels if installed (worth it for batches)
 
     Returns:
         Dictionary with analysis results including estimated person count
@@ -60,8 +250,9 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
         }
 
     try:
-        # Load image
-        img = cv2.imread(image_path)
+        # Load image (read the file in one call and decode from memory)
+        raw = np.fromfile(image_path, dtype=np.uint8)
+        img = cv2.imdecode(raw, cv2.IMREAD_COLOR) if raw.size else None
         if img is None:
             return {
                 "success": False,
@@ -71,65 +262,23 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
         height, width = img.shape[:2]
         total_pixels = height * width
 
-        # Convert to different color spaces for analysis
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-
         # =====================================================================
-        # 1. SKIN TONE DETECTION
+        # 1-3. SKIN, BRIGHT COLOR AND ACTIVITY AREA DETECTION (_build_masks)
+        # 4. COMBINED ACTIVITY SCORE
         # =====================================================================
-        # Detect human skin tones (exposed skin on beach)
-        # HSV ranges for skin detection (calibrated for various lighting)
-        lower_skin1 = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin1 = np.array([20, 255, 255], dtype=np.uint8)
-
-        lower_skin2 = np.array([0, 10, 60], dtype=np.uint8)
-        upper_skin2 = np.array([25, 150, 255], dtype=np.uint8)
-
-        skin_mask1 = cv2.inRange(hsv, lower_skin1, upper_skin1)
-        skin_mask2 = cv2.inRange(hsv, lower_skin2, upper_skin2)
-        skin_mask = cv2.bitwise_or(skin_mask1, skin_mask2)
-
-        # Apply morphological operations to reduce noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_OPEN, kernel, iterations=2)
-        skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+        # Overall "activity" areas are the union of skin and bright masks; it
+        # is counted together with the individual masks in one pass. The masks
+        # themselves are only kept when debug images are requested.
+        kernels = _numba_kernels() if use_numba else None
+        if save_debug:
+            counts, (skin_mask, bright_mask, edges) = _compute_with_debug(img, kernels)
+        else:
+            counts = _compute_counts_fast(img, kernels)
+        skin_pixels, bright_pixels, edge_pixels, activity_pixels = counts
 
-        skin_pixels = cv2.countNonZero(skin_mask)
         skin_percentage = (skin_pixels / total_pixels) * 100
-
-        # =====================================================================
-        # 2. BRIGHT COLOR DETECTION (swimwear, towels, umbrellas)
-        # =====================================================================
-        # Detect bright, saturated colors typical of beach gear
-        lower_bright = np.array([0, 50, 100], dtype=np.uint8)
-        upper_bright = np.array([180, 255, 255], dtype=np.uint8)
-
-        bright_mask = cv2.inRange(hsv, lower_bright, upper_bright)
-        bright_mask = cv2.morphologyEx(bright_mask, cv2.MORPH_OPEN, kernel, iterations=1)
-
-        bright_pixels = cv2.countNonZero(bright_mask)
         bright_percentage = (bright_pixels / total_pixels) * 100
-
-        # =====================================================================
-        # 3. ACTIVITY AREA DETECTION (texture variation)
-        # =====================================================================
-        # Use Canny edge detection to find areas with high variation
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
-
-        # Dilate edges to connect nearby edges (people tend to create clusters)
-        edges = cv2.dilate(edges, kernel, iterations=2)
-
-        edge_pixels = cv2.countNonZero(edges)
         edge_percentage = (edge_pixels / total_pixels) * 100
-
-        # =====================================================================
-        # 4. COMBINED ACTIVITY SCORE
-        # =====================================================================
-        # Combine masks to get overall "activity" areas
-        combined_mask = cv2.bitwise_or(skin_mask, bright_mask)
-        activity_pixels = cv2.countNonZero(combined_mask)
         activity_percentage = (activity_pixels / total_pixels) * 100
 
         # =====================================================================
@@ -158,14 +307,7 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
         # Higher skin tone % and bright color % = higher confidence
         signal_strength = (skin_percentage + bright_percentage) / 2
 
-        if signal_strength < 1.0:
-            confidence = 0.3  # Low confidence
-        elif signal_strength < 3.0:
-            confidence = 0.5  # Medium confidence
-        elif signal_strength < 6.0:
-            confidence = 0.7  # Good confidence
-        else:
-            confidence = 0.85  # High confidence
+        confidence = CONFIDENCE_LEVELS[bisect_right(CONFIDENCE_THRESHOLDS, signal_strength)]
 
         # =====================================================================
         # 6. SAVE DEBUG VISUALIZATION (optional)
@@ -178,10 +320,11 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
             image_name = Path(image_path).stem
 
             # Save masks
-            cv2.imwrite(str(output_dir / f"{image_name}_skin_mask.jpg"), skin_mask)
-            cv2.imwrite(str(output_dir / f"{image_name}_bright_mask.jpg"), bright_mask)
-            cv2.imwrite(str(output_dir / f"{image_name}_edges.jpg"), edges)
-            cv2.imwrite(str(output_dir / f"{image_name}_combined.jpg"), combined_mask)
+            combined_mask = cv2.bitwise_or(skin_mask, bright_mask)
+            save_debug_image(output_dir / f"{image_name}_skin_mask.jpg", skin_mask)
+            save_debug_image(output_dir / f"{image_name}_bright_mask.jpg", bright_mask)
+            save_debug_image(output_dir / f"{image_name}_edges.jpg", edges)
+            save_debug_image(output_dir / f"{image_name}_combined.jpg", combined_mask)
 
             # Create overlay visualization
             overlay = img.copy()
@@ -196,7 +339,7 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
             cv2.putText(result_img, f"Method: Pixel Density",
                        (20, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
 
-            cv2.imwrite(str(output_dir / f"{image_name}_analysis.jpg"), result_img)
+            save_debug_image(output_dir / f"{image_name}_analysis.jpg", result_img)
 
         # =====================================================================
         # 7. RETURN RESULTS
@@ -247,6 +390,41 @@ def analyze_pixel_density(image_path: str, beach_area_sqm: float = 5000, save_de
         }
 
 
+def _init_batch_worker():
+    """Pin each batch worker to one thread so N processes don't oversubscribe N cores."""
+    kernels = _numba_kernels()
+    if kernels is not None:
+        kernels.set_num_threads(1)
+    cv2.setNumThreads(1)
+
+
+def _analyze_batch_item(image_path, beach_area_sqm, save_debug, use_numba):
+    """Worker entry point; pool processes exit without joining threads, so flush debug writes first."""
+    result = analyze_pixel_density(image_path, beach_area_sqm=beach_area_sqm, save_debug=save_debug,
+                                   use_numba=use_numba)
+    wait_for_debug_writes()
+    return result
+
+
+def analyze_batch(image_paths: list, beach_area_sqm: float = 5000, save_debug: bool = False):
+    """
+    Analyze many images across all cores, one image per worker process.
+
+    The numba kernels are only used for more than one image; a single image
+    is faster on the OpenCV path than the numba import and JIT warm-up.
+
+    Returns results in the same order as image_paths.
+    """
+    analyze = partial(_analyze_batch_item, beach_area_sqm=beach_area_sqm, save_debug=save_debug,
+                      use_numba=len(image_paths) > 1)
+    workers = min(len(image_paths), os.cpu_count() or 1)
+    if workers <= 1:
+        return [analyze(path) for path in image_paths]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as executor:
+        return list(executor.map(analyze, image_paths))
+
+
 def main():
     """
     CLI interface for pixel density analysis
@@ -256,29 +434,48 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
 
-    parser.add_argument('image_path', type=str, help='Path to the image file')
+    parser.add_argument('image_path', type=str, nargs='?', help='Path to the image file')
     parser.add_argument('--beach-area', type=float, default=5000,
                        help='Beach area in square meters (default: 5000)')
     parser.add_argument('--save-debug', action='store_true',
                        help='Save debug visualization images')
     parser.add_argument('--json', action='store_true',
                        help='Output results as JSON (for Node.js integration)')
+    parser.add_argument('--batch', type=str, metavar='FILE|DIR',
+                       help='Analyze every image listed in FILE (one path per line) or found in DIR, '
+                            'in parallel across CPU cores')
 
     args = parser.parse_args()
 
+    if args.batch:
+        if os.path.isdir(args.batch):
+            image_paths = sorted(
+                os.path.join(args.batch, name) for name in os.listdir(args.batch)
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+            )
+        else:
+            with open(args.batch) as f:
+                image_paths = [line.strip() for line in f if line.strip()]
+    elif args.image_path:
+        image_paths = [args.image_path]
+    else:
+        parser.error('image_path is required unless --batch is given')
+
     # Run analysis
-    result = analyze_pixel_density(
-        args.image_path,
+    results = analyze_batch(
+        image_paths,
         beach_area_sqm=args.beach_area,
         save_debug=args.save_debug
     )
 
     # Output results
     if args.json:
-        # JSON output for Node.js integration
-        print(json.dumps(result, indent=2))
-    else:
-        # Human-readable output
+        # JSON output for Node.js integration (a list in batch mode)
+        print(json.dumps(results if args.batch else results[0], indent=2))
+        return
+
+    # Human-readable output
+    for result in results:
         if result['success']:
             print(f"\n{'='*60}")
             print(f"🏖️  Pixel Density Analysis Results (Fallback Method)")
@@ -316,7 +513,9 @@ def main():
             print(f"{'─'*60}\n")
         else:
             print(f"\n❌ ERROR: {result['error']}\n")
-            sys.exit(1)
+
+    if any(not result['success'] for result in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,576 @@
+"""
+Shared detection pipeline for beach-detector.py and pi-detector.py
+
+Model export and loading, image decoding, SAHI-style slicing (Slicing Aided
+Hyper Inference), batched YOLO inference and merging of tile detections.
+yolo-detector.py uses the export helpers only.
+"""
+
+import sys
+import math
+import contextlib
+import functools
+import logging
+import platform
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ultralytics import YOLO
+from ultralytics.utils import DEFAULT_CFG_DICT, LOGGER
+import cv2
+import numpy as np
+import torch
+from PIL.JpegImagePlugin import JpegImageFile
+
+try:
+    # Vectorized C++/CUDA NMS; the NumPy loop below is only a fallback
+    from torchvision.ops import nms as torchvision_nms
+except ImportError:
+    torchvision_nms = None
+
+
+# Model input size, and the smallest tile size used for slicing
+SLICE_SIZE = 640
+SLICE_OVERLAP = 0.25
+
+# Tiles per YOLO forward pass (also the batch size of exported engines)
+TILE_BATCH = 8
+
+# Normalized bounding box area (person box area / image area) above which
+# people are large enough that slicing is skipped
+TARGET_NBA = 0.02
+
+# Tiles whose grayscale std and mean Laplacian response are both below these
+# are treated as background (flat sky, sand, letterbox bars) and skipped
+TILE_MIN_STD = 8.0
+TILE_MIN_EDGE = 1.0
+
+# Tile detections centred closer than this to an inner tile edge are dropped
+# as fragments. At most half the tile overlap, so neighbouring tiles' kept
+# areas still meet and no point is dropped by every tile
+TILE_EDGE_MARGIN = int(SLICE_SIZE * SLICE_OVERLAP) // 2
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+# Images with a longer side than this are decoded at 1/2, 1/4 or 1/8 size;
+# slicing still yields 640 tiles, just over fewer pixels
+MAX_DECODE_SIDE = 3840
+
+# platform.machine() values that get an NCNN export (Raspberry Pi and other ARM boards)
+ARM_MACHINES = {'aarch64', 'arm64', 'armv7l'}
+
+# Checked once: FP16 inference is used on CUDA and for NCNN models
+CUDA_AVAILABLE = torch.cuda.is_available()
+
+# Precision arguments; newer ultralytics releases replace half/int8 with quantize
+FP16_ARGS = {'quantize': 16} if 'quantize' in DEFAULT_CFG_DICT else {'half': True}
+INT8_ARGS = {'quantize': 8} if 'quantize' in DEFAULT_CFG_DICT else {'int8': True}
+
+
+def export_target(model_path, fmt=None):
+    """
+    Pick the fastest runtime for this machine, unless fmt names one.
+
+    - CUDA GPU ('engine'): TensorRT engine, FP16, batch of TILE_BATCH
+    - ARM CPU ('ncnn', Raspberry Pi): NCNN, FP16
+    - x86 CPU ('openvino'): OpenVINO, INT8
+
+    Returns:
+        (format, export options, export path next to the weights)
+    """
+    if fmt is None:
+        if CUDA_AVAILABLE:
+            fmt = 'engine'
+        elif platform.machine().lower() in ARM_MACHINES:
+            fmt = 'ncnn'
+        else:
+            fmt = 'openvino'
+
+    path = Path(model_path)
+    options, exported = {
+        'engine': ({**FP16_ARGS, 'batch': TILE_BATCH}, path.with_suffix('.engine')),
+        'ncnn': (FP16_ARGS, path.parent / f'{path.stem}_ncnn_model'),
+        'openvino': (INT8_ARGS, path.parent / f'{path.stem}_int8_openvino_model'),
+    }[fmt]
+    return fmt, options, exported
+
+
+def exported_model(model_path, fmt=None):
+    """
+    Path of an existing export of a .pt model, without exporting.
+
+    fmt picks the runtime as in export_target.
+
+    Returns:
+        The export made by export_model if there is one, else model_path
+    """
+    if Path(model_path).suffix != '.pt':
+        return model_path
+    _, _, exported = export_target(model_path, fmt)
+    return str(exported) if exported.exists() else model_path
+
+
+@functools.lru_cache(maxsize=2)
+def export_model(model_path, fmt=None):
+    """
+    Export a .pt model to the fastest runtime for this machine, or to fmt
+    (see export_target).
+
+    Run once as an explicit setup step (--export); exports are written next
+    to the weights and picked up by exported_model on later runs. Exporting
+    can install packages and download calibration data, so a failure is
+    recorded in a .failed marker beside the export and not retried until
+    the marker is deleted. Non-.pt models are returned unchanged, as is the
+    .pt path if the export fails.
+
+    Returns:
+        Path of the model to load
+    """
+    path = Path(model_path)
+    if path.suffix != '.pt':
+        return model_path
+
+    fmt, options, exported = export_target(model_path, fmt)
+    if exported.exists():
+        return str(exported)
+
+    failed = exported.with_name(exported.name + '.failed')
+    if failed.exists():
+        print(f"Warning: {fmt} export failed before, using {model_path} (delete {failed} to retry)",
+              file=sys.stderr)
+        return model_path
+
+    # Ultralytics logs export progress to stdout; send it to stderr so
+    # --json output stays parseable
+    handlers = [(h, h.stream) for h in LOGGER.handlers if isinstance(h, logging.StreamHandler)]
+    for handler, _ in handlers:
+        handler.stream = sys.stderr
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            exported = YOLO(model_path).export(format=fmt, imgsz=SLICE_SIZE, **options)
+    except Exception as e:
+        print(f"Warning: {fmt} export failed ({e}), using {model_path}", file=sys.stderr)
+        with contextlib.suppress(OSError):
+            failed.write_text(f"{e}\n")
+        return model_path
+    finally:
+        for handler, stream in handlers:
+            handler.stream = stream
+
+    return str(exported)
+
+
+@functools.lru_cache(maxsize=2)
+def load_model(model_path):
+    """Load a YOLO model once per process; later calls reuse the instance."""
+    return YOLO(model_path)
+
+
+def read_image(image_path):
+    """
+    Decode an image, letting libjpeg downscale JPEGs larger than 4K.
+
+    OpenCV decodes JPEGs at 1/2, 1/4 or 1/8 size in a single pass, which is
+    much cheaper than a full decode. The size is read from the JPEG header
+    first to pick the smallest reduction that fits MAX_DECODE_SIDE. Other
+    formats are decoded at full size.
+
+    Returns (image, scale, (width, height)): scale maps decoded pixel
+    coordinates back to the original size, and (width, height) is that size
+    after EXIF rotation, as decoded. image is None if unreadable.
+    """
+    scale = 1
+    if Path(image_path).suffix.lower() in ('.jpg', '.jpeg'):
+        try:
+            with JpegImageFile(image_path) as header:
+                width, height = header.size
+            while max(width, height) > MAX_DECODE_SIDE * scale and scale < 8:
+                scale *= 2
+        except (OSError, SyntaxError):
+            pass
+
+    flags = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }[scale]
+    image = cv2.imread(str(image_path), flags)
+    if image is None:
+        return None, scale, None
+    if scale == 1:
+        width, height = image.shape[1], image.shape[0]
+    elif (image.shape[1] > image.shape[0]) != (width > height):
+        # imread applied an EXIF rotation the header size doesn't include
+        width, height = height, width
+    return image, scale, (width, height)
+
+
+def tile_coords(h, w, slice_size, stride, shift=0):
+    """
+    Tile rectangles on a stride grid, clamped so edge tiles end at the border.
+
+    The grid starts at (shift, shift). Returns an (N, 4) int32 array of
+    (x_start, y_start, x_end, y_end), row by row. Ends are clipped to the
+    image, so images smaller than slice_size get short tiles.
+    """
+    # Clamping maps the last strides onto the same origin, so drop repeats
+    xs = np.unique(np.maximum(0, np.minimum(np.arange(shift, w, stride), w - slice_size)))
+    ys = np.unique(np.maximum(0, np.minimum(np.arange(shift, h, stride), h - slice_size)))
+    x_start, y_start = (grid.ravel() for grid in np.meshgrid(xs, ys, indexing='xy'))
+    return np.stack([
+        x_start,
+        y_start,
+        np.minimum(x_start + slice_size, w),
+        np.minimum(y_start + slice_size, h),
+    ], axis=1).astype(np.int32)
+
+
+def tile_rects(h, w, slice_size=SLICE_SIZE, overlap=SLICE_OVERLAP):
+    """
+    Tile rectangles for slicing an h x w image.
+
+    Tiles come from two grids, the second shifted by half a tile.
+
+    Returns:
+        (N, 4) int32 array with the x1, y1, x2, y2 of each tile
+    """
+    stride = int(slice_size * (1 - overlap))
+
+    # The unshifted grid alone puts every point at least half the overlap
+    # inside some tile (see TILE_EDGE_MARGIN); the shifted grid sees people
+    # on its seams whole, away from every edge
+    rects = np.concatenate([
+        tile_coords(h, w, slice_size, stride),
+        tile_coords(h, w, slice_size, stride, shift=slice_size // 2),
+    ])
+    _, first = np.unique(rects, axis=0, return_index=True)
+    return rects[np.sort(first)]
+
+
+def slice_image(image, slice_size=SLICE_SIZE, overlap=SLICE_OVERLAP):
+    """
+    Slice image into overlapping tiles for better small object detection.
+    This is a simplified version of SAHI (Slicing Aided Hyper Inference).
+
+    Returns:
+        (tiles, rects): (N, slice_size, slice_size, 3) uint8 tile buffer
+        and an (N, 4) int32 array with the x1, y1, x2, y2 of each tile
+    """
+    h, w = image.shape[:2]
+    rects = tile_rects(h, w, slice_size, overlap)
+
+    # Copy tiles into one contiguous buffer; tiles of images smaller than
+    # slice_size are zero-padded on the bottom/right so offsets stay valid
+    tiles = np.zeros((len(rects), slice_size, slice_size, 3), dtype=np.uint8)
+    for tile, (x1, y1, x2, y2) in zip(tiles, rects):
+        tile[:y2 - y1, :x2 - x1] = image[y1:y2, x1:x2]
+
+    return tiles, rects
+
+
+def drop_background_tiles(tiles, rects, min_std=TILE_MIN_STD, min_edge=TILE_MIN_EDGE):
+    """
+    Drop background-only tiles before they reach the model.
+
+    Flat sky, water or sand and black letterbox bars have almost no
+    contrast and no edges, so they can't contain people. A tile is dropped
+    only when both its grayscale std and its edge density are low.
+
+    Returns:
+        (tiles, rects) with background tiles removed
+    """
+    keep = np.ones(len(tiles), dtype=bool)
+    for i, tile in enumerate(tiles):
+        gray = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+        _, std = cv2.meanStdDev(gray)
+        if std[0, 0] < min_std and cv2.Laplacian(gray, cv2.CV_8U).mean() < min_edge:
+            keep[i] = False
+
+    if keep.all():
+        return tiles, rects
+    return tiles[keep], rects[keep]
+
+
+def tile_edge_mask(boxes, rects, width, height, margin=TILE_EDGE_MARGIN):
+    """
+    Mask out detections cut off by an inner tile edge.
+
+    A person split across a tile border shows up as a fragment whose box has
+    little overlap with the whole person, so NMS can't merge the two. Boxes
+    whose centre lies within margin pixels of a tile edge are dropped unless
+    that edge is the image border; an overlapping tile sees them whole.
+
+    Args:
+        boxes: (N, 4) xyxy box tensor in image coordinates
+        rects: (N, 4) tensor with the x1, y1, x2, y2 of each box's tile
+
+    Returns:
+        (N,) bool tensor, True for boxes to keep
+    """
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    x1, y1, x2, y2 = rects.unbind(1)
+    return (
+        ((x1 <= 0) | (cx - x1 >= margin))
+        & ((y1 <= 0) | (cy - y1 >= margin))
+        & ((x2 >= width) | (x2 - cx >= margin))
+        & ((y2 >= height) | (y2 - cy >= margin))
+    )
+
+
+def adaptive_slice_size(boxes, width, height, min_size=SLICE_SIZE, target_nba=TARGET_NBA):
+    """
+    Choose a tile size from the size of people found in the full image.
+
+    Uses the median normalized bounding box area (NBA) of the full-image
+    detections, so a few people close to the camera don't hide a crowd of
+    distant ones. The tile size is picked so people in a tile reach
+    target_nba, rounded to the model stride and never below min_size.
+
+    Returns:
+        Tile size in pixels, or None when people are already large enough
+        that slicing can be skipped
+    """
+    if len(boxes) == 0:
+        return min_size
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    nba = float(np.median(areas)) / (width * height)
+    if nba >= target_nba:
+        return None
+
+    tiles = math.ceil(target_nba / nba)
+    slice_size = int(round(math.sqrt(width * height / tiles) / 32) * 32)
+    return max(min_size, min(slice_size, min(width, height)))
+
+
+def merge_detections(boxes, scores, iou_threshold=0.5):
+    """
+    Merge detections from multiple slices, removing duplicates via NMS.
+
+    Args:
+        boxes: (N, 4) float32 tensor of [x1, y1, x2, y2]
+        scores: (N,) float32 tensor of confidences
+
+    Returns:
+        Indices of the boxes to keep, highest confidence first
+    """
+    if len(boxes) == 0:
+        return []
+
+    if torchvision_nms is not None:
+        return torchvision_nms(boxes, scores, iou_threshold).tolist()
+
+    # Simple NMS implementation
+    boxes, scores = boxes.cpu().numpy(), scores.cpu().numpy()
+    indices = []
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    while len(order) > 0:
+        i = order[0]
+        indices.append(i)
+
+        if len(order) == 1:
+            break
+
+        # Calculate IoU with remaining boxes
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+
+        w = np.maximum(0, xx2 - xx1)
+        h = np.maximum(0, yy2 - yy1)
+
+        inter = w * h
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-6)
+
+        remaining = np.where(iou <= iou_threshold)[0]
+        order = order[remaining + 1]
+
+    return [int(i) for i in indices]
+
+
+def predict_batch(model, images, confidence, pad_batch=False, half=False):
+    """
+    Run person detection on a list of images, TILE_BATCH images per forward pass.
+
+    With pad_batch, short batches are padded with blank tiles so exported
+    engines with a fixed batch size always receive a full batch. half runs
+    inference in FP16.
+
+    Returns one result per input image, in order.
+    """
+    results = []
+    for start in range(0, len(images), TILE_BATCH):
+        batch = images[start:start + TILE_BATCH]
+        count = len(batch)
+        if pad_batch and count < TILE_BATCH:
+            blank = np.zeros((SLICE_SIZE, SLICE_SIZE, 3), dtype=np.uint8)
+            batch = batch + [blank] * (TILE_BATCH - count)
+
+        batch_results = model(
+            batch,
+            conf=confidence,
+            classes=[0],  # Person class only
+            imgsz=SLICE_SIZE,
+            verbose=False,
+            **(FP16_ARGS if half else {})
+        )
+        results.extend(batch_results[:count])
+
+    return results
+
+
+def prepare_tile_batch(tiles, pad_batch=False, stream=None):
+    """
+    Turn a chunk of BGR tiles into the normalized RGB BCHW tensor YOLO takes.
+
+    Tiles larger than SLICE_SIZE are resized down; callers scale the boxes back.
+    With a CUDA stream, the uint8 tiles are copied from pinned memory and
+    normalized on that stream, and the returned event marks when the batch
+    is ready.
+
+    Returns (batch, count, event), where count excludes padding tiles.
+    """
+    count = len(tiles)
+    if tiles.shape[1] != SLICE_SIZE:
+        tiles = np.stack([cv2.resize(tile, (SLICE_SIZE, SLICE_SIZE), interpolation=cv2.INTER_LINEAR)
+                          for tile in tiles])
+    if pad_batch and count < TILE_BATCH:
+        blank = np.zeros((TILE_BATCH - count, SLICE_SIZE, SLICE_SIZE, 3), dtype=np.uint8)
+        tiles = np.concatenate([tiles, blank])
+
+    batch = torch.from_numpy(tiles)
+    if stream is None:
+        return batch.permute(0, 3, 1, 2).flip(1).float().div_(255), count, None
+
+    with torch.cuda.stream(stream):
+        batch = batch.pin_memory().to('cuda', non_blocking=True)
+        batch = batch.permute(0, 3, 1, 2).flip(1).float().div_(255)
+        event = torch.cuda.Event()
+        event.record(stream)
+    return batch, count, event
+
+
+def predict_tiles(model, tiles, confidence, pad_batch=False, half=False):
+    """
+    Run person detection on an array of equally sized tiles.
+
+    Like predict_batch, but each TILE_BATCH chunk is preprocessed on a worker
+    thread while the previous chunk is being inferred, so resizing,
+    normalization and the host-to-device copy overlap with the model.
+    Boxes come back in SLICE_SIZE tile space.
+
+    Returns one result per tile, in order.
+    """
+    stream = torch.cuda.Stream() if CUDA_AVAILABLE else None
+    batches = queue.Queue(maxsize=2)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for start in range(0, len(tiles), TILE_BATCH):
+                if stop.is_set():
+                    break
+                batches.put(prepare_tile_batch(tiles[start:start + TILE_BATCH], pad_batch, stream))
+        except Exception as e:
+            batches.put(e)
+        batches.put(None)
+
+    results = []
+    item = True
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(produce)
+        try:
+            while (item := batches.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                batch, count, ready = item
+                if ready is not None:
+                    torch.cuda.current_stream().wait_event(ready)
+                    batch.record_stream(torch.cuda.current_stream())
+
+                batch_results = model(
+                    batch,
+                    conf=confidence,
+                    classes=[0],  # Person class only
+                    imgsz=SLICE_SIZE,
+                    verbose=False,
+                    **(FP16_ARGS if half else {})
+                )
+                results.extend(batch_results[:count])
+        finally:
+            # Unblock the producer so the pool can shut down
+            stop.set()
+            while item is not None:
+                item = batches.get()
+
+    return results
+
+
+def detect_people(model_path, image, confidence, use_slicing=True):
+    """
+    Detect people in a decoded BGR image: a full-image pass plus adaptive slicing.
+
+    The full-image pass catches larger people and measures how big people
+    are, which decides how finely to slice. Tile detections cut off by an
+    inner tile edge are dropped, then one NMS merges tiles and full image.
+
+    Args:
+        model_path: Model to run (loaded once per process)
+        image: BGR image
+        confidence: Confidence threshold
+        use_slicing: Whether to slice images larger than 1280 px
+
+    Returns:
+        (boxes, scores): (N, 4) float32 xyxy boxes in image pixels and (N,)
+        float32 confidences, highest confidence first
+    """
+    model = load_model(model_path)
+    h, w = image.shape[:2]
+    pad_batch = str(model_path).endswith('.engine')
+    half = CUDA_AVAILABLE or 'ncnn' in str(model_path)
+
+    # Full-image detection first. It can't be skipped or run smaller (e.g.
+    # imgsz=416): small people drop out, the median box looks bigger and
+    # slices get far too coarse
+    full_result = predict_batch(model, [image], confidence, pad_batch=pad_batch, half=half)[0]
+
+    tiles, rects = [], np.empty((0, 4), dtype=np.int32)
+    tile_scale = 1.0
+    if use_slicing and (w > 1280 or h > 1280):
+        # Use slicing for large images, unless people are already large
+        slice_size = adaptive_slice_size(full_result.boxes.xyxy.cpu().numpy(), w, h)
+        if slice_size is not None:
+            tiles, rects = slice_image(image, slice_size=slice_size)
+            tiles, rects = drop_background_tiles(tiles, rects)
+            tile_scale = slice_size / SLICE_SIZE
+
+    # The full image goes last, matching its whole-image rect below
+    results = predict_tiles(model, tiles, confidence, pad_batch=pad_batch, half=half) + [full_result]
+
+    # Flatten boxes from every tile into one tensor and shift them back to
+    # original image coordinates (the full image has offset 0, 0)
+    boxes = torch.cat([r.boxes.xyxy for r in results]).float()
+    scores = torch.cat([r.boxes.conf for r in results]).float()
+    rects = torch.from_numpy(np.vstack([rects, [[0, 0, w, h]]])).to(boxes.device, boxes.dtype)
+    tile_idx = torch.repeat_interleave(
+        torch.arange(len(results), device=boxes.device),
+        torch.tensor([len(r.boxes) for r in results], device=boxes.device)
+    )
+    boxes[tile_idx < len(tiles)] *= tile_scale
+    boxes += rects[tile_idx, :2].repeat(1, 2)
+
+    # Drop fragments at inner tile edges (margin grows with the tile size)
+    inside = tile_edge_mask(boxes, rects[tile_idx], w, h, TILE_EDGE_MARGIN * tile_scale)
+    boxes, scores = boxes[inside], scores[inside]
+
+    # Single NMS over tile and full-image detections to remove duplicates
+    keep = merge_detections(boxes, scores, iou_threshold=0.4)
+    kept = torch.cat([boxes, scores[:, None]], dim=1)[keep].cpu().numpy()
+    return kept[:, :4], kept[:, 4]
@@ -8,9 +8,12 @@ Designed to be called from Node.js scraper pipeline.
 
 Usage:
     python yolo-detector.py <image_path> [--model yolov8m.pt] [--confidence 0.5] [--json]
+    python yolo-detector.py --batch paths.txt [--json]
+    python yolo-detector.py --server [--model yolov8m.pt] [--confidence 0.5]
 
 Requirements:
     pip install ultralytics opencv-python pillow
+    # Opt-in: on CPU, --export runs an OpenVINO INT8 export of the model (made once, then reused)
 
 Author: BeachWatch Team
 Date: 2026-01-23
@@ -19,12 +22,18 @@ Date: 2026-01-23
 import os
 import sys
 import json
+import queue
+import logging
 import argparse
+import threading
 from pathlib import Path
 
 try:
     from ultralytics import YOLO
+    from ultralytics.utils import LOGGER
     import cv2
+    import numpy as np
+    from tiling import CUDA_AVAILABLE, FP16_ARGS, export_model, exported_model
 except ImportError:
     print(json.dumps({
         "success": False,
@@ -33,7 +42,143 @@ except ImportError:
     sys.exit(1)
 
 
-def detect_persons(image_path: str, model_name: str = "yolov8m.pt", confidence_threshold: float = 0.5, save_annotated: bool = False):
+# Loaded models by name; loading weights dominates per-image latency
+_MODEL_CACHE = {}
+
+# Images per forward pass for batch and server mode
+BATCH_SIZE = 8
+
+# YOLO input size; images are shrunk to this long side before inference
+INPUT_SIZE = 640
+
+
+def _get_model(model_name: str, use_export: bool = False):
+    """
+    Load a YOLO model once per process and reuse it for later images.
+
+    With use_export and no CUDA, a .pt model's OpenVINO INT8 export is
+    loaded instead if one was made with --export.
+    """
+    key = (model_name, use_export)
+    if key not in _MODEL_CACHE:
+        # FP16 inference on CUDA; on CPU an OpenVINO INT8 export only if asked for
+        use_int8 = use_export and not CUDA_AVAILABLE
+        _MODEL_CACHE[key] = YOLO(exported_model(model_name, 'openvino') if use_int8 else model_name)
+    return _MODEL_CACHE[key]
+
+
+def _load_downscaled(image_path: str):
+    """
+    Read an image and shrink it so its long side is at most INPUT_SIZE.
+
+    YOLO letterboxes to INPUT_SIZE anyway; doing the resize once here with
+    INTER_AREA keeps full-resolution frames out of the predictor. Aspect
+    ratio is preserved so people aren't squashed.
+
+    Returns (image, (sx, sy)) where sx, sy map resized coordinates back to
+    the original image, or (None, None) if the image can't be read.
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return None, None
+
+    h, w = image.shape[:2]
+    if max(h, w) <= INPUT_SIZE:
+        return image, (1.0, 1.0)
+
+    ratio = INPUT_SIZE / max(h, w)
+    new_w, new_h = max(1, round(w * ratio)), max(1, round(h * ratio))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    return resized, (w / new_w, h / new_h)
+
+
+def _summarize(result, image_path: str, model_name: str, confidence_threshold: float, save_annotated: bool,
+               scale: tuple = (1.0, 1.0)):
+    """
+    Turn one Ultralytics result into the detection dictionary returned to callers.
+
+    scale is the (sx, sy) factor from the inference image back to the original.
+    """
+    sx, sy = scale
+    # Extract person detections (class 0 in COCO dataset)
+    person_class_id = 0
+    boxes = result.boxes
+
+    # Filter for person class with confidence above threshold on whole arrays,
+    # then build dictionaries only for the kept boxes
+    confidences = boxes.conf.cpu().numpy().astype(np.float64)
+    keep = (boxes.cls.cpu().numpy() == person_class_id) & (confidences >= confidence_threshold)
+    confidences = np.round(confidences[keep], 3)
+    bboxes = boxes.xyxy.cpu().numpy()[keep].astype(np.float64) * (sx, sy, sx, sy)
+    person_detections = [
+        {
+            'bbox': bbox,  # [x1, y1, x2, y2] in original pixels
+            'confidence': confidence,
+            'class': 'person'
+        }
+        for bbox, confidence in zip(bboxes.tolist(), confidences.tolist())
+    ]
+
+    # Calculate statistics
+    total_detections = len(person_detections)
+
+    if total_detections > 0:
+        min_confidence = round(float(confidences.min()), 3)
+        max_confidence = round(float(confidences.max()), 3)
+        avg_confidence = round(float(confidences.mean()), 3)
+
+        # Confidence distribution
+        high_conf = int((confidences >= 0.7).sum())
+        med_conf = int(((confidences >= 0.5) & (confidences < 0.7)).sum())
+        low_conf = int((confidences < 0.5).sum())
+
+        confidence_distribution = {
+            'high': high_conf,  # >= 0.7
+            'medium': med_conf,  # 0.5 - 0.7
+            'low': low_conf     # < 0.5
+        }
+    else:
+        min_confidence = 0
+        max_confidence = 0
+        avg_confidence = 0
+        confidence_distribution = {'high': 0, 'medium': 0, 'low': 0}
+
+    # Optionally save annotated image
+    annotated_image_path = None
+    if save_annotated and total_detections > 0:
+        output_dir = Path(image_path).parent / "annotated"
+        output_dir.mkdir(exist_ok=True)
+
+        image_name = Path(image_path).stem
+        annotated_image_path = str(output_dir / f"{image_name}_annotated.jpg")
+
+        # Inference ran on a downscaled copy; draw the person boxes, already
+        # scaled back, onto the full-resolution original
+        annotated_image = cv2.imread(image_path)
+        for x1, y1, x2, y2 in bboxes.round().astype(int).tolist():
+            cv2.rectangle(annotated_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.imwrite(annotated_image_path, annotated_image)
+
+    # Return results
+    return {
+        "success": True,
+        "image_path": image_path,
+        "model": model_name,
+        "confidence_threshold": confidence_threshold,
+        "detections": {
+            "total_persons": total_detections,
+            "min_confidence": min_confidence,
+            "max_confidence": max_confidence,
+            "avg_confidence": avg_confidence,
+            "confidence_distribution": confidence_distribution,
+            "persons": person_detections
+        },
+        "annotated_image_path": annotated_image_path
+    }
+
+
+def detect_persons(image_path: str, model_name: str = "yolov8m.pt", confidence_threshold: float = 0.5, save_annotated: bool = False,
+                   use_export: bool = False):
     """
     Run YOLOv8 person detection on an image.
 
@@ -42,104 +187,153 @@ def detect_persons(image_path: str, model_name: str = "yolov8m.pt", confidence_t
         model_name: YOLOv8 model variant (yolov8n, yolov8s, yolov8m, yolov8l, yolov8x)
         confidence_threshold: Minimum confidence for detections (0.0-1.0)
         save_annotated: Whether to save an annotated image with bounding boxes
+        use_export: On CPU, run the OpenVINO INT8 export of a .pt model if one exists (opt-in)
 
     Returns:
         Dictionary with detection results
     """
+    return detect_persons_batch([image_path], model_name, confidence_threshold, save_annotated, use_export)[0]
 
-    # Check if image exists
-    if not os.path.exists(image_path):
-        return {
-            "success": False,
-            "error": f"Image not found: {image_path}"
-        }
 
-    try:
-        # Load YOLOv8 model (downloads pretrained weights on first run)
-        model = YOLO(model_name)
-
-        # Run inference (suppress verbose output)
-        results = model(image_path, verbose=False)
-        result = results[0]  # Get first result
-
-        # Extract person detections (class 0 in COCO dataset)
-        person_class_id = 0
-        boxes = result.boxes
-
-        # Filter for person class with confidence above threshold
-        person_detections = []
-        for box in boxes:
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-
-            if class_id == person_class_id and confidence >= confidence_threshold:
-                person_detections.append({
-                    'bbox': box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
-                    'confidence': round(confidence, 3),
-                    'class': 'person'
-                })
-
-        # Calculate statistics
-        total_detections = len(person_detections)
-
-        if total_detections > 0:
-            confidences = [d['confidence'] for d in person_detections]
-            min_confidence = round(min(confidences), 3)
-            max_confidence = round(max(confidences), 3)
-            avg_confidence = round(sum(confidences) / len(confidences), 3)
-
-            # Confidence distribution
-            high_conf = len([d for d in person_detections if d['confidence'] >= 0.7])
-            med_conf = len([d for d in person_detections if 0.5 <= d['confidence'] < 0.7])
-            low_conf = len([d for d in person_detections if d['confidence'] < 0.5])
-
-            confidence_distribution = {
-                'high': high_conf,  # >= 0.7
-                'medium': med_conf,  # 0.5 - 0.7
-                'low': low_conf     # < 0.5
+def detect_persons_batch(image_paths: list, model_name: str = "yolov8m.pt", confidence_threshold: float = 0.5,
+                         save_annotated: bool = False, use_export: bool = False):
+    """
+    Run YOLOv8 person detection on several images, BATCH_SIZE per forward pass.
+
+    Args:
+        image_paths: Paths to the image files
+        model_name: YOLOv8 model variant (yolov8n, yolov8s, yolov8m, yolov8l, yolov8x)
+        confidence_threshold: Minimum confidence for detections (0.0-1.0)
+        save_annotated: Whether to save annotated images with bounding boxes
+        use_export: On CPU, run the OpenVINO INT8 export of a .pt model if one exists (opt-in)
+
+    Returns:
+        List of detection result dictionaries, one per path, in order
+    """
+    results = [None] * len(image_paths)
+
+    # Check if images exist, then decode and downscale them
+    found, images, scales = [], [], []
+    for i, image_path in enumerate(image_paths):
+        if not image_path:
+            results[i] = {
+                "success": False,
+                "error": "Empty image path"
             }
-        else:
-            min_confidence = 0
-            max_confidence = 0
-            avg_confidence = 0
-            confidence_distribution = {'high': 0, 'medium': 0, 'low': 0}
-
-        # Optionally save annotated image
-        annotated_image_path = None
-        if save_annotated and total_detections > 0:
-            output_dir = Path(image_path).parent / "annotated"
-            output_dir.mkdir(exist_ok=True)
-
-            image_name = Path(image_path).stem
-            annotated_image_path = str(output_dir / f"{image_name}_annotated.jpg")
-
-            # Create annotated image with bounding boxes
-            annotated_image = result.plot()  # Draw boxes on image
-            cv2.imwrite(annotated_image_path, annotated_image)
-
-        # Return results
-        return {
-            "success": True,
-            "image_path": image_path,
-            "model": model_name,
-            "confidence_threshold": confidence_threshold,
-            "detections": {
-                "total_persons": total_detections,
-                "min_confidence": min_confidence,
-                "max_confidence": max_confidence,
-                "avg_confidence": avg_confidence,
-                "confidence_distribution": confidence_distribution,
-                "persons": person_detections
-            },
-            "annotated_image_path": annotated_image_path
-        }
+            continue
+
+        if not os.path.exists(image_path):
+            results[i] = {
+                "success": False,
+                "error": f"Image not found: {image_path}"
+            }
+            continue
+
+        image, scale = _load_downscaled(image_path)
+        if image is None:
+            results[i] = {
+                "success": False,
+                "error": f"Could not read image: {image_path}",
+                "image_path": image_path
+            }
+            continue
+
+        found.append(i)
+        images.append(image)
+        scales.append(scale)
 
+    try:
+        # Load YOLOv8 model (downloads pretrained weights on first run, cached after)
+        model = _get_model(model_name, use_export)
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "image_path": image_path
-        }
+        for i in found:
+            results[i] = {"success": False, "error": str(e), "image_path": image_paths[i]}
+        return results
+
+    for start in range(0, len(found), BATCH_SIZE):
+        chunk = found[start:start + BATCH_SIZE]
+        try:
+            # Run inference on the whole chunk at once (suppress verbose output)
+            batch_results = model(
+                images[start:start + BATCH_SIZE],
+                verbose=False,
+                batch=len(chunk),
+                imgsz=INPUT_SIZE,
+                **(FP16_ARGS if CUDA_AVAILABLE else {})
+            )
+            for i, result, scale in zip(chunk, batch_results, scales[start:start + BATCH_SIZE]):
+                results[i] = _summarize(result, image_paths[i], model_name, confidence_threshold, save_annotated, scale)
+        except Exception as e:
+            if len(chunk) == 1:
+                results[chunk[0]] = {"success": False, "error": str(e), "image_path": image_paths[chunk[0]]}
+                continue
+            # One bad image fails the whole forward pass; retry one by one
+            for i in chunk:
+                results[i] = detect_persons(image_paths[i], model_name, confidence_threshold, save_annotated, use_export)
+
+    return results
+
+
+def log_to_stderr():
+    """Send Ultralytics logging to stderr so JSON on stdout stays parseable."""
+    for handler in LOGGER.handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(sys.stderr)
+
+
+def serve(args):
+    """
+    Long-running mode for the Node.js pipeline.
+
+    Reads one image path per line from stdin and writes exactly one JSON
+    result per line to stdout, in the same order (blank lines get an error
+    result), so the model is loaded once for every image. Paths already
+    queued when a forward pass starts share it; a lone path never waits.
+    """
+    # Only result lines go to the real stdout; anything else printed there
+    # (Ultralytics download progress bars, for one) would be read as a result
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    # stdin is read on a thread so paths pile up in the queue while a
+    # forward pass runs
+    lines = queue.Queue()
+
+    def read_stdin():
+        for line in sys.stdin:
+            lines.put(line.strip())
+        lines.put(None)
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+
+    eof = False
+    while not eof:
+        # Block for the first path, then take whatever is already queued
+        batch = []
+        image_path = lines.get()
+        while True:
+            if image_path is None:
+                eof = True
+                break
+            batch.append(image_path)
+            if len(batch) >= BATCH_SIZE:
+                break
+            try:
+                image_path = lines.get_nowait()
+            except queue.Empty:
+                break
+
+        if not batch:
+            continue
+        results = detect_persons_batch(
+            batch,
+            model_name=args.model,
+            confidence_threshold=args.confidence,
+            save_annotated=args.save_annotated,
+            use_export=args.export
+        )
+        for result in results:
+            print(json.dumps(result), file=out, flush=True)
 
 
 def main():
@@ -151,7 +345,7 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
 
-    parser.add_argument('image_path', type=str, help='Path to the image file')
+    parser.add_argument('image_path', type=str, nargs='?', help='Path to the image file')
     parser.add_argument('--model', type=str, default='yolov8m.pt',
                         help='YOLOv8 model variant (default: yolov8m.pt)')
     parser.add_argument('--confidence', type=float, default=0.5,
@@ -160,23 +354,51 @@ def main():
                         help='Save annotated image with bounding boxes')
     parser.add_argument('--json', action='store_true',
                         help='Output results as JSON (for Node.js integration)')
+    parser.add_argument('--export', action='store_true',
+                        help='Run on CPU with an OpenVINO INT8 export of the model (made once, then reused)')
+    parser.add_argument('--batch', type=str, metavar='FILE',
+                        help='Detect every image listed in FILE (one path per line) in batched passes')
+    parser.add_argument('--server', action='store_true',
+                        help='Read image paths from stdin, one per line, and write one JSON result per line')
 
     args = parser.parse_args()
 
+    if args.json or args.server:
+        log_to_stderr()
+
+    # Exporting is a one-off setup step, never a side effect of detection
+    if args.export and not CUDA_AVAILABLE:
+        args.model = export_model(args.model, 'openvino')
+
+    if args.server:
+        serve(args)
+        return
+
+    if args.batch:
+        with open(args.batch) as f:
+            image_paths = [line.strip() for line in f if line.strip()]
+    elif args.image_path:
+        image_paths = [args.image_path]
+    else:
+        parser.error('image_path is required unless --batch or --server is given')
+
     # Run detection
-    result = detect_persons(
-        args.image_path,
+    results = detect_persons_batch(
+        image_paths,
         model_name=args.model,
         confidence_threshold=args.confidence,
-        save_annotated=args.save_annotated
+        save_annotated=args.save_annotated,
+        use_export=args.export
     )
 
     # Output results
     if args.json:
-        # JSON output for Node.js integration
-        print(json.dumps(result, indent=2))
-    else:
-        # Human-readable output
+        # JSON output for Node.js integration (a list in batch mode)
+        print(json.dumps(results if args.batch else results[0], indent=2))
+        return
+
+    # Human-readable output
+    for result in results:
         if result['success']:
             print(f"\n{'='*60}")
             print(f"🏖️  YOLOv8 Person Detection Results")
@@ -209,7 +431,9 @@ def main():
             print(f"{'─'*60}\n")
         else:
             print(f"\n❌ ERROR: {result['error']}\n")
-            sys.exit(1)
+
+    if not all(result['success'] for result in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
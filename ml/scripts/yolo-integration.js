@@ -154,9 +154,134 @@ function getBusynessLevel(score) {
   return 'Very Busy';
 }
 
+/**
+ * Persistent yolo-detector.py processes, keyed by Python path and detector
+ * settings. Each runs in --server mode: image paths are written to stdin and
+ * one JSON result per line comes back, so the model is loaded only once.
+ */
+const detectorServers = new Map();
+
+/**
+ * Keep the Node event loop alive only while a detector has work pending,
+ * so scripts exit normally when they are done with it
+ *
+ * @param {Object} server - Detector server entry
+ */
+function updateDetectorRef(server) {
+  const method = server.pending.length > 0 ? 'ref' : 'unref';
+  server.child[method]();
+  server.child.stdin[method]();
+  server.child.stdout[method]();
+  server.child.stderr[method]();
+}
+
+/**
+ * Get (or start) the detector server for a set of options
+ *
+ * @param {Object} options - Detector options
+ * @returns {Object} Detector server entry
+ */
+function getDetectorServer({ model, confidence, saveAnnotated, int8, pythonPath }) {
+  const key = [pythonPath, model, confidence, saveAnnotated, int8].join('|');
+  const existing = detectorServers.get(key);
+  if (existing) {
+    return existing;
+  }
+
+  const scriptPath = path.join(__dirname, 'yolo-detector.py');
+
+  const args = [
+    scriptPath,
+    '--server',
+    '--model', model,
+    '--confidence', confidence.toString()
+  ];
+
+  if (saveAnnotated) {
+    args.push('--save-annotated');
+  }
+
+  // Opt-in: OpenVINO INT8 on CPU, exported on first use
+  if (int8) {
+    args.push('--export');
+  }
+
+  const server = {
+    child: spawn(pythonPath, args),
+    pending: [],
+    outputData: '',
+    errorData: ''
+  };
+  detectorServers.set(key, server);
+
+  // Results come back in request order, one JSON object per line
+  server.child.stdout.on('data', (data) => {
+    server.outputData += data.toString();
+
+    let newline;
+    while ((newline = server.outputData.indexOf('\n')) !== -1) {
+      const line = server.outputData.slice(0, newline).trim();
+      server.outputData = server.outputData.slice(newline + 1);
+
+      // Stray non-JSON output must not use up a pending request, or every
+      // later result would resolve the wrong image's promise
+      let result;
+      try {
+        result = JSON.parse(line);
+      } catch {
+        result = null;
+      }
+      if (!result || typeof result !== 'object') {
+        if (line) {
+          server.errorData = (server.errorData + line + '\n').slice(-4096);
+        }
+        continue;
+      }
+
+      const request = server.pending.shift();
+      if (request) {
+        request.resolve(result);
+      }
+    }
+
+    updateDetectorRef(server);
+  });
+
+  server.child.stderr.on('data', (data) => {
+    // Keep the tail only; the process is long-lived
+    server.errorData = (server.errorData + data.toString()).slice(-4096);
+  });
+
+  const fail = (error) => {
+    if (detectorServers.get(key) === server) {
+      detectorServers.delete(key);
+    }
+    for (const request of server.pending.splice(0)) {
+      request.reject(error);
+    }
+  };
+
+  server.child.on('close', (code) => {
+    fail(new Error(`YOLOv8 detector failed with code ${code}: ${server.errorData}`));
+  });
+
+  server.child.on('error', (error) => {
+    fail(new Error(`Failed to start Python process: ${error.message}`));
+  });
+
+  // Writes racing a dead process are reported through 'close' instead
+  server.child.stdin.on('error', () => {});
+
+  updateDetectorRef(server);
+  return server;
+}
+
 /**
  * Detect persons in an image using YOLOv8
  *
+ * The first call starts a persistent detector process; later calls with the
+ * same options reuse it and its loaded model.
+ *
  * @param {string} imagePath - Path to the image file
  * @param {Object} options - Detection options
  * @returns {Promise<Object>} Detection results with person count and confidence
@@ -166,57 +291,36 @@ async function detectPersons(imagePath, options = {}) {
     model = 'yolov8m.pt',
     confidence = 0.5,
     saveAnnotated = false,
+    int8 = false,
     pythonPath = path.join(__dirname, 'venv', 'bin', 'python3')
   } = options;
 
-  return new Promise((resolve, reject) => {
-    const scriptPath = path.join(__dirname, 'yolo-detector.py');
-
-    const args = [
-      scriptPath,
-      imagePath,
-      '--model', model,
-      '--confidence', confidence.toString(),
-      '--json'
-    ];
-
-    if (saveAnnotated) {
-      args.push('--save-annotated');
-    }
-
-    const pythonProcess = spawn(pythonPath, args);
-
-    let outputData = '';
-    let errorData = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      outputData += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      errorData += data.toString();
-    });
-
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        reject(new Error(`YOLOv8 detector failed with code ${code}: ${errorData}`));
-        return;
-      }
+  // The detector reads one path per line and answers each line in order;
+  // a path it would split or skip would pair later results with the wrong image
+  if (!imagePath || /[\r\n]/.test(imagePath)) {
+    throw new Error(`Invalid image path: ${JSON.stringify(imagePath)}`);
+  }
 
-      try {
-        const result = JSON.parse(outputData);
-        resolve(result);
-      } catch (error) {
-        reject(new Error(`Failed to parse YOLOv8 output: ${error.message}\nOutput: ${outputData}`));
-      }
-    });
+  const server = getDetectorServer({ model, confidence, saveAnnotated, int8, pythonPath });
 
-    pythonProcess.on('error', (error) => {
-      reject(new Error(`Failed to start Python process: ${error.message}`));
-    });
+  return new Promise((resolve, reject) => {
+    server.pending.push({ resolve, reject });
+    updateDetectorRef(server);
+    server.child.stdin.write(`${imagePath}\n`);
   });
 }
 
+/**
+ * Stop all persistent detector processes
+ * Optional: idle detectors do not keep Node running and exit with it
+ */
+function closeDetectors() {
+  for (const server of detectorServers.values()) {
+    server.child.stdin.end();
+  }
+  detectorServers.clear();
+}
+
 /**
  * Detect persons using pixel density analysis (fallback method)
  *
@@ -422,6 +526,11 @@ try:
 except ImportError as e:
     print(f"MISSING: {e}")
     sys.exit(1)
+try:
+    import numba
+    print("NUMBA")
+except ImportError:
+    pass
 `;
 
     const pythonProcess = spawn(pythonPath, ['-c', checkScript]);
@@ -439,14 +548,19 @@ except ImportError as e:
 
     pythonProcess.on('close', (code) => {
       if (code === 0 && outputData.includes('OK')) {
+        // numba is optional: it only speeds up pixel density batches
+        const numba = outputData.includes('NUMBA');
         resolve({
           installed: true,
-          message: 'YOLOv8 dependencies are installed'
+          numba,
+          message: numba
+            ? 'YOLOv8 dependencies are installed'
+            : 'YOLOv8 dependencies are installed (optional numba missing: pip install numba)'
         });
       } else {
         resolve({
           installed: false,
-          message: 'YOLOv8 dependencies missing. Install with: pip install ultralytics opencv-python pillow',
+          message: 'YOLOv8 dependencies missing. Install with: pip install ultralytics opencv-python pillow numba',
           error: errorData
         });
       }
@@ -464,6 +578,7 @@ except ImportError as e:
 
 export {
   detectPersons,
+  closeDetectors,
   detectPersonsPixelDensity,
   analyzeBeachCrowd,
   calculateBusynessScore,
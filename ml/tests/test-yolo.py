@@ -21,13 +21,15 @@ from pathlib import Path
 try:
     from ultralytics import YOLO
     import cv2
+    import numpy as np
 except ImportError:
     print("❌ Missing dependencies. Please install:")
     print("   pip install ultralytics opencv-python pillow")
     exit(1)
 
 
-def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confidence_threshold: float = 0.5):
+def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confidence_threshold: float = 0.5,
+                          save_annotated: bool = False):
     """
     Run YOLOv8 person detection on a beach image.
 
@@ -35,6 +37,7 @@ def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confi
         image_path: Path to the test image
         model_name: YOLOv8 model variant (yolov8n, yolov8s, yolov8m, yolov8l, yolov8x)
         confidence_threshold: Minimum confidence for detections (0.0-1.0)
+        save_annotated: Whether to save an annotated image with person boxes
 
     Returns:
         Dictionary with detection results
@@ -69,18 +72,19 @@ def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confi
     person_class_id = 0
     boxes = result.boxes
 
-    # Filter for person class with confidence above threshold
-    person_detections = []
-    for i, box in enumerate(boxes):
-        class_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-
-        if class_id == person_class_id and confidence >= confidence_threshold:
-            person_detections.append({
-                'bbox': box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
-                'confidence': confidence,
-                'class': 'person'
-            })
+    # Filter for person class with confidence above threshold on whole arrays,
+    # then build dictionaries only for the kept boxes
+    confidences = boxes.conf.cpu().numpy().astype(np.float64)
+    keep = (boxes.cls.cpu().numpy() == person_class_id) & (confidences >= confidence_threshold)
+    confidences = confidences[keep]
+    person_detections = [
+        {
+            'bbox': bbox,  # [x1, y1, x2, y2]
+            'confidence': confidence,
+            'class': 'person'
+        }
+        for bbox, confidence in zip(boxes.xyxy.cpu().numpy()[keep].tolist(), confidences.tolist())
+    ]
 
     # Print results
     print(f"{'─'*70}")
@@ -88,34 +92,39 @@ def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confi
     print(f"{'─'*70}\n")
 
     print(f"👥 Total People Detected: {len(person_detections)}")
-    print(f"📈 Confidence Range: {min([d['confidence'] for d in person_detections]):.2f} - {max([d['confidence'] for d in person_detections]):.2f}" if person_detections else "📈 Confidence Range: N/A")
-    print(f"📊 Average Confidence: {sum([d['confidence'] for d in person_detections]) / len(person_detections):.2f}" if person_detections else "📊 Average Confidence: N/A")
+    print(f"📈 Confidence Range: {confidences.min():.2f} - {confidences.max():.2f}" if person_detections else "📈 Confidence Range: N/A")
+    print(f"📊 Average Confidence: {confidences.mean():.2f}" if person_detections else "📊 Average Confidence: N/A")
 
     # Confidence distribution
     if person_detections:
-        high_conf = len([d for d in person_detections if d['confidence'] >= 0.7])
-        med_conf = len([d for d in person_detections if 0.5 <= d['confidence'] < 0.7])
-        low_conf = len([d for d in person_detections if d['confidence'] < 0.5])
+        high_conf = int((confidences >= 0.7).sum())
+        med_conf = int(((confidences >= 0.5) & (confidences < 0.7)).sum())
+        low_conf = int((confidences < 0.5).sum())
 
         print(f"\n🎯 Confidence Distribution:")
         print(f"   High (≥0.7): {high_conf} people")
         print(f"   Medium (0.5-0.7): {med_conf} people")
         print(f"   Low (<0.5): {low_conf} people")
 
-    # Save annotated image
-    output_dir = Path("../../test-data/screenshots/annotated")
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Optionally save annotated image
+    output_path = None
+    if save_annotated:
+        output_dir = Path("../../test-data/screenshots/annotated")
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-    image_name = Path(image_path).stem
-    output_path = output_dir / f"{image_name}_annotated.jpg"
+        image_name = Path(image_path).stem
+        output_path = output_dir / f"{image_name}_annotated.jpg"
 
-    print(f"\n⏳ Saving annotated image...")
+        print(f"\n⏳ Saving annotated image...")
 
-    # Create annotated image with bounding boxes
-    annotated_image = result.plot()  # Draw boxes on image
-    cv2.imwrite(str(output_path), annotated_image)
+        # Draw only the kept person boxes, straight onto the original image
+        annotated_image = result.orig_img
+        for d in person_detections:
+            x1, y1, x2, y2 = map(int, d['bbox'])
+            cv2.rectangle(annotated_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.imwrite(str(output_path), annotated_image)
 
-    print(f"✅ Annotated image saved: {output_path}")
+        print(f"✅ Annotated image saved: {output_path}")
 
     print(f"\n{'─'*70}")
     print(f"✅ TEST COMPLETE")
@@ -128,7 +137,7 @@ def test_person_detection(image_path: str, model_name: str = "yolov8m.pt", confi
         'confidence_threshold': confidence_threshold,
         'total_detections': len(person_detections),
         'detections': person_detections,
-        'annotated_image_path': str(output_path)
+        'annotated_image_path': str(output_path) if output_path else None
     }
 
 
@@ -180,7 +189,8 @@ if __name__ == "__main__":
 
     # Run single model test (YOLOv8m - recommended)
     print("\n🚀 Running YOLOv8m test on Bondi Beach screenshot...\n")
-    result = test_person_detection(test_image, model_name="yolov8m.pt", confidence_threshold=0.5)
+    result = test_person_detection(test_image, model_name="yolov8m.pt", confidence_threshold=0.5,
+                                   save_annotated=True)
 
     # Optionally, compare multiple models
     # Uncomment the line below to compare YOLOv8n, YOLOv8s, and YOLOv8m